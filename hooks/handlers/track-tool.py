@@ -4,16 +4,22 @@ Main hook for claude-tool-tracker plugin.
 Logs tool usage with visual formatting and tracks statistics.
 """
 
+import time
+_STARTED = time.perf_counter()
+
 import json
+import os
 import sys
-from pathlib import Path
 
-# Add scripts directory to path for imports
-plugin_root = Path(__file__).parent.parent.parent
-sys.path.insert(0, str(plugin_root / "scripts"))
+# Add scripts directory to path for imports (os.path avoids importing pathlib)
+plugin_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(plugin_root, "scripts"))
 
+# Only config is needed up front; stats, sampling and metrics are imported
+# once we know the category is enabled, so disabled categories exit early.
 from config import load_config, is_category_enabled
-from stats import record_tool_usage, categorize_tool
+
+_IMPORTED = time.perf_counter()
 
 # ANSI Color codes
 RESET = '\033[0m'
@@ -36,22 +42,57 @@ BG_YELLOW = '\033[43m'
 BG_GREEN = '\033[42m'
 BG_BLUE = '\033[44m'
 
-
-def render_colorful(tool_type: str, primary: str, secondary: str = "", extra: str = "") -> str:
-    """Render tool usage in colorful theme (default)."""
-    colors = {
+# Render tables, built once at import instead of on every render call
+
+# Colorful theme: (color, background, top border, bottom border)
+COLORFUL_STYLES = {
+    tool_type: (
+        color,
+        bg_color,
+        f"{BOLD}{color}\u250c{'─' * 47}\u2510{RESET}",
+        f"{BOLD}{color}\u2514{'─' * 47}\u2518{RESET}",
+    )
+    for tool_type, (color, bg_color) in {
         "mcp": (CYAN, BG_CYAN),
         "agent": (MAGENTA, BG_MAGENTA),
         "skill": (YELLOW, BG_YELLOW),
         "command": (GREEN, BG_GREEN),
         "native": (BLUE, BG_BLUE)
-    }
+    }.items()
+}
+
+MINIMAL_COLORS = {
+    "mcp": CYAN,
+    "agent": MAGENTA,
+    "skill": YELLOW,
+    "command": GREEN,
+    "native": GREEN  # TOOL prefix in green
+}
+
+# Labels matching screenshot format (minimal theme and systemMessage)
+LABELS = {
+    "mcp": "MCP",
+    "agent": "AGENT",
+    "skill": "SKILL",
+    "command": "CMD",
+    "native": "TOOL"  # Screenshot shows "TOOL Read"
+}
+
+EMOJIS = {
+    "mcp": "\U0001F310",      # Globe
+    "agent": "\U0001F916",    # Robot
+    "skill": "\u26A1",         # Lightning
+    "command": "\U0001F4DD",  # Memo
+    "native": "\U0001F527"    # Wrench
+}
+
 
-    color, bg_color = colors.get(tool_type, (BLUE, BG_BLUE))
+def render_colorful(tool_type: str, primary: str, secondary: str = "", extra: str = "") -> str:
+    """Render tool usage in colorful theme (default)."""
+    color, bg_color, top, bottom = COLORFUL_STYLES.get(tool_type, COLORFUL_STYLES["native"])
     label = tool_type.upper()
 
-    lines = []
-    lines.append(f"{BOLD}{color}\u250c{'─' * 47}\u2510{RESET}")
+    lines = [top]
 
     if secondary:
         lines.append(f"{BOLD}{color}\u2502{RESET} {bg_color}{BOLD}{WHITE} {label} {RESET} {color}{primary}{RESET} {DIM}→{RESET} {BOLD}{secondary}{RESET}")
@@ -61,32 +102,15 @@ def render_colorful(tool_type: str, primary: str, secondary: str = "", extra: st
     if extra:
         lines.append(f"{BOLD}{color}\u2502{RESET} {DIM}{extra}{RESET}")
 
-    lines.append(f"{BOLD}{color}\u2514{'─' * 47}\u2518{RESET}")
+    lines.append(bottom)
 
     return '\n'.join(lines)
 
 
 def render_minimal(tool_type: str, primary: str, secondary: str = "", extra: str = "") -> str:
     """Render tool usage in minimal/clean theme (screenshot format)."""
-    colors = {
-        "mcp": CYAN,
-        "agent": MAGENTA,
-        "skill": YELLOW,
-        "command": GREEN,
-        "native": GREEN  # TOOL prefix in green
-    }
-
-    # Labels matching screenshot format
-    labels = {
-        "mcp": "MCP",
-        "agent": "AGENT",
-        "skill": "SKILL",
-        "command": "CMD",
-        "native": "TOOL"  # Screenshot shows "TOOL Read"
-    }
-
-    color = colors.get(tool_type, GRAY)
-    label = labels.get(tool_type, tool_type.upper())
+    color = MINIMAL_COLORS.get(tool_type, GRAY)
+    label = LABELS.get(tool_type, tool_type.upper())
 
     if secondary:
         return f"{color}{label} {primary} → {secondary}{RESET}"
@@ -96,15 +120,7 @@ def render_minimal(tool_type: str, primary: str, secondary: str = "", extra: str
 
 def render_emoji(tool_type: str, primary: str, secondary: str = "", extra: str = "") -> str:
     """Render tool usage in emoji theme."""
-    emojis = {
-        "mcp": "\U0001F310",      # Globe
-        "agent": "\U0001F916",    # Robot
-        "skill": "\u26A1",         # Lightning
-        "command": "\U0001F4DD",  # Memo
-        "native": "\U0001F527"    # Wrench
-    }
-
-    emoji = emojis.get(tool_type, "\U0001F527")
+    emoji = EMOJIS.get(tool_type, "\U0001F527")
 
     if secondary:
         return f"{emoji} {primary} → {secondary}"
@@ -170,14 +186,7 @@ def render_output(tool_type: str, primary: str, secondary: str, extra: str, them
 
 def render_system_message(tool_type: str, primary: str, secondary: str = "") -> str:
     """Render clean message for systemMessage output (no ANSI colors)."""
-    labels = {
-        "mcp": "MCP",
-        "agent": "AGENT",
-        "skill": "SKILL",
-        "command": "CMD",
-        "native": "TOOL"
-    }
-    label = labels.get(tool_type, tool_type.upper())
+    label = LABELS.get(tool_type, tool_type.upper())
 
     if secondary:
         return f"{label} {primary} → {secondary}"
@@ -185,46 +194,82 @@ def render_system_message(tool_type: str, primary: str, secondary: str = "") ->
         return f"{label} {primary}"
 
 
+def lap(timings: dict, phase: str, start: float) -> float:
+    """Add the time since start to a phase and return the new start time."""
+    now = time.perf_counter()
+    timings[phase] = timings.get(phase, 0.0) + (now - start) * 1000
+    return now
+
+
 def main():
+    # Phase timings in milliseconds (monotonic clock)
+    timings = {"startup": (_IMPORTED - _STARTED) * 1000}
+    deferred = False
+
     try:
+        phase_start = time.perf_counter()
+
         # Read input from stdin
         input_data = json.load(sys.stdin)
 
         tool_name = input_data.get("tool_name", "unknown")
         tool_input = input_data.get("tool_input", {})
 
-        # Load configuration
-        config = load_config()
-        theme = config.get("theme", "colorful")
-
         # Parse tool information
         tool_type, primary, secondary, extra, detailed_name = parse_tool_info(tool_name, tool_input)
+        phase_start = lap(timings, "parse", phase_start)
 
-        # Check if category is enabled
-        if is_category_enabled(tool_type):
-            # Record statistics with detailed name for subcategory tracking
-            record_tool_usage(detailed_name)
-
-            # Generate display message for systemMessage (visible in console)
-            display_msg = render_system_message(tool_type, primary, secondary)
-
-            # Also render themed output to stderr (visible in verbose mode)
-            output = render_output(tool_type, primary, secondary, extra, theme)
-            print(output, file=sys.stderr)
+        # Load configuration
+        config = load_config()
+        theme = config.get("theme", "colorful")
+        enabled = is_category_enabled(tool_type, config)
+        phase_start = lap(timings, "config", phase_start)
 
-            # Return success response with systemMessage for console visibility
-            response = {
-                "continue": True,
-                "suppressOutput": False,
-                "systemMessage": f"📊 {display_msg}"
-            }
-        else:
-            response = {
+        # Disabled categories exit before touching stats
+        if not enabled:
+            print(json.dumps({
                 "continue": True,
                 "suppressOutput": False
-            }
-
-        print(json.dumps(response))
+            }))
+            return
+
+        from stats import record_tool_usage, defer_tool_usage
+        from sampling import record_sampled_tool_usage
+        from metrics import load_metrics_state, record_metrics, get_deadline_ms, get_lock_timeout_s, should_defer
+        phase_start = lap(timings, "startup", phase_start)
+
+        metrics_state = load_metrics_state()
+        phase_start = lap(timings, "metrics", phase_start)
+
+        deadline_ms = get_deadline_ms(config)
+        if should_defer(timings, metrics_state, deadline_ms):
+            # Fast path: queue the event instead of rewriting stats
+            deferred = True
+            defer_tool_usage(detailed_name)
+        else:
+            # Record statistics with detailed name for subcategory tracking;
+            # waiting on a contended lock is bounded by what's left of the deadline
+            lock_timeout_s = get_lock_timeout_s(timings, deadline_ms)
+            if config.get("sampling", False):
+                _, deferred = record_sampled_tool_usage(detailed_name, tool_type, config, lock_timeout_s)
+            else:
+                deferred = not record_tool_usage(detailed_name, lock_timeout_s=lock_timeout_s)
+        phase_start = lap(timings, "defer" if deferred else "stats_io", phase_start)
+
+        # Generate display message for systemMessage (visible in console)
+        display_msg = render_system_message(tool_type, primary, secondary)
+
+        # Also render themed output to stderr (visible in verbose mode)
+        output = render_output(tool_type, primary, secondary, extra, theme)
+        print(output, file=sys.stderr)
+        lap(timings, "render", phase_start)
+
+        # Return success response with systemMessage for console visibility
+        print(json.dumps({
+            "continue": True,
+            "suppressOutput": False,
+            "systemMessage": f"📊 {display_msg}"
+        }))
 
     except Exception as e:
         # On error, still allow the tool to proceed
@@ -233,6 +278,12 @@ def main():
             "suppressOutput": False,
             "systemMessage": f"Tool tracker error: {str(e)}"
         }))
+        return
+
+    try:
+        record_metrics(metrics_state, timings, deferred, deadline_ms)
+    except Exception:
+        pass
 
 
 if __name__ == "__main__":
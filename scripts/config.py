@@ -4,10 +4,12 @@ Configuration manager for claude-tool-tracker plugin.
 Handles reading and writing configuration from .local.md files.
 """
 
+from __future__ import annotations
+
 import os
-import re
-from pathlib import Path
-from typing import Dict, Any, Optional
+
+# Builtin annotations and os.path strings keep typing and pathlib out of the
+# hook's imports, which keeps its startup cheap.
 
 # Default configuration
 DEFAULT_CONFIG = {
@@ -15,28 +17,40 @@ DEFAULT_CONFIG = {
     "stats_location": "global",  # global, local
     "enabled_categories": ["native", "mcp", "agent", "skill", "command"],
     "show_stats_on_exit": False,
+    "sampling": False,  # Sample high-volume native tools instead of recording every call
+    "sampling_budget_ms": 5,  # Target stats I/O overhead per call when sampling
+    "hook_deadline_ms": 500,  # Defer stats I/O when a hook phase runs longer than this
 }
 
 # Config file name
 CONFIG_FILENAME = "claude-tool-tracker.local.md"
 
+# Loaded config per working directory; the hook reads it several times per call
+_config_cache: dict[str, dict] = {}
 
-def get_global_config_path() -> Path:
+
+def get_global_config_path() -> str:
     """Get path to global config file."""
-    return Path.home() / ".claude" / CONFIG_FILENAME
+    return os.path.join(os.path.expanduser("~"), ".claude", CONFIG_FILENAME)
+
 
+def _local_config_file() -> str:
+    """Get path to local (project) config file, whether or not it exists."""
+    return os.path.join(os.getcwd(), ".claude", CONFIG_FILENAME)
 
-def get_local_config_path() -> Optional[Path]:
+
+def get_local_config_path() -> str | None:
     """Get path to local (project) config file if exists."""
-    cwd = Path.cwd()
-    local_path = cwd / ".claude" / CONFIG_FILENAME
-    if local_path.exists():
+    local_path = _local_config_file()
+    if os.path.exists(local_path):
         return local_path
     return None
 
 
-def parse_yaml_frontmatter(content: str) -> Dict[str, Any]:
+def parse_yaml_frontmatter(content: str) -> dict:
     """Parse YAML frontmatter from markdown content."""
+    import re  # Deferred: only needed when a config file exists
+
     config = {}
 
     # Match YAML frontmatter between --- markers
@@ -96,42 +110,48 @@ def parse_yaml_frontmatter(content: str) -> Dict[str, Any]:
     return config
 
 
-def load_config() -> Dict[str, Any]:
-    """Load configuration, merging local over global over defaults."""
+def load_config() -> dict:
+    """Load configuration, merging local over global over defaults.
+
+    The result is cached per working directory for the life of the process.
+    """
+    cwd = os.getcwd()
+    if cwd in _config_cache:
+        return _copy_config(_config_cache[cwd])
+
     config = DEFAULT_CONFIG.copy()
 
-    # Load global config
-    global_path = get_global_config_path()
-    if global_path.exists():
-        try:
-            content = global_path.read_text()
-            global_config = parse_yaml_frontmatter(content)
-            config.update(global_config)
-        except Exception:
-            pass
-
-    # Load local config (overrides global)
-    local_path = get_local_config_path()
-    if local_path:
-        try:
-            content = local_path.read_text()
-            local_config = parse_yaml_frontmatter(content)
-            config.update(local_config)
-        except Exception:
-            pass
+    # Load global config, then local config (overrides global)
+    config.update(_read_config_file(get_global_config_path()))
+    config.update(_read_config_file(os.path.join(cwd, ".claude", CONFIG_FILENAME)))
+
+    _config_cache[cwd] = config
+    return _copy_config(config)
+
+
+def _read_config_file(path: str) -> dict:
+    """Read and parse a config file, or return {} if missing or unreadable."""
+    try:
+        with open(path, 'r') as f:
+            return parse_yaml_frontmatter(f.read())
+    except Exception:
+        return {}
 
-    return config
 
+def _copy_config(config: dict) -> dict:
+    """Copy config so callers can modify it without touching the cache."""
+    return {key: list(value) if isinstance(value, list) else value for key, value in config.items()}
 
-def save_config(config: Dict[str, Any], location: str = "global") -> bool:
+
+def save_config(config: dict, location: str = "global") -> bool:
     """Save configuration to file."""
     if location == "global":
         config_path = get_global_config_path()
     else:
-        config_path = Path.cwd() / ".claude" / CONFIG_FILENAME
+        config_path = _local_config_file()
 
     # Ensure directory exists
-    config_path.parent.mkdir(parents=True, exist_ok=True)
+    os.makedirs(os.path.dirname(config_path), exist_ok=True)
 
     # Generate YAML content
     yaml_lines = ["---"]
@@ -152,9 +172,11 @@ def save_config(config: Dict[str, Any], location: str = "global") -> bool:
     yaml_lines.append("Edit the YAML frontmatter above to customize behavior.")
 
     content = '\n'.join(yaml_lines)
+    _config_cache.clear()
 
     try:
-        config_path.write_text(content)
+        with open(config_path, 'w') as f:
+            f.write(content)
         return True
     except Exception:
         return False
@@ -182,9 +204,10 @@ def get_stats_location() -> str:
     return config.get("stats_location", "global")
 
 
-def is_category_enabled(category: str) -> bool:
+def is_category_enabled(category: str, config: dict | None = None) -> bool:
     """Check if a category is enabled for logging."""
-    config = load_config()
+    if config is None:
+        config = load_config()
     enabled = config.get("enabled_categories", DEFAULT_CONFIG["enabled_categories"])
     return category in enabled
 
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Self-instrumentation for claude-tool-tracker plugin.
+Tracks how long each phase of the hook takes and when it had to degrade.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+
+# Import stats to get stats location
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stats import get_stats_dir, count_deferred_usage, lock_stats, open_queue, claim_queue
+
+METRICS_FILENAME = "metrics.json"
+METRICS_LOG_FILENAME = "metrics.jsonl"
+METRICS_STATE_FILENAME = "metrics-state.json"
+
+# Hook phases in execution order
+PHASES = ["startup", "parse", "config", "metrics", "stats_io", "defer", "render"]
+
+PHASE_LABELS = {
+    "startup": "Startup/imports",
+    "parse": "Parse input",
+    "config": "Config load",
+    "metrics": "Metrics I/O",
+    "stats_io": "Stats I/O",
+    "defer": "Deferred append",
+    "render": "Render",
+}
+
+# Per-call timings are appended to a log and folded into metrics.json
+# once it grows past this size (about 50 calls)
+COMPACT_LOG_BYTES = 5 * 1024
+
+DEFAULT_DEADLINE_MS = 500.0
+
+# After this many consecutive deferrals, retry stats I/O to probe recovery
+MAX_DEFERRED_STREAK = 20
+
+
+def get_metrics_path() -> str:
+    """Get path to metrics file (next to the stats file)."""
+    return os.path.join(get_stats_dir(), METRICS_FILENAME)
+
+
+def get_metrics_log_path() -> str:
+    """Get path to the log of per-call timings not yet folded into metrics."""
+    return os.path.join(get_stats_dir(), METRICS_LOG_FILENAME)
+
+
+def get_metrics_state_path() -> str:
+    """Get path to the state the hook reads on every call."""
+    return os.path.join(get_stats_dir(), METRICS_STATE_FILENAME)
+
+
+def empty_metrics() -> dict:
+    """Build an empty metrics structure."""
+    return {
+        "calls": 0,
+        "deferred": 0,
+        "phases": {
+            phase: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "last_ms": 0.0}
+            for phase in PHASES
+        }
+    }
+
+
+def _load_summary() -> dict:
+    """Load compacted metrics from metrics.json."""
+    try:
+        with open(get_metrics_path(), 'r') as f:
+            metrics = json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return empty_metrics()
+
+    # Fill in anything missing from older or partial files
+    merged = empty_metrics()
+    if isinstance(metrics, dict):
+        for key in ("calls", "deferred"):
+            merged[key] = metrics.get(key, 0)
+        for phase, values in metrics.get("phases", {}).items():
+            if phase in merged["phases"]:
+                merged["phases"][phase].update(values)
+    return merged
+
+
+def _fold_log(metrics: dict, lines: list) -> None:
+    """Fold logged calls into metrics, skipping any corrupt lines."""
+    for line in lines:
+        try:
+            entry = json.loads(line)
+            update_metrics(metrics, entry["t"], bool(entry.get("d")))
+        except (json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            continue
+
+
+def load_metrics() -> dict:
+    """Load metrics, including calls still in the log.
+
+    This folds the whole log, so it is meant for display; the hook itself
+    only reads the small state file (see load_metrics_state).
+    """
+    metrics = _load_summary()
+
+    try:
+        with open(get_metrics_log_path(), 'r') as f:
+            _fold_log(metrics, f.readlines())
+    except IOError:
+        pass
+    return metrics
+
+
+def load_metrics_state() -> dict:
+    """Load what the hook needs to decide on deferral.
+
+    Holds the last stats I/O time and the number of consecutive deferrals.
+    """
+    try:
+        with open(get_metrics_state_path(), 'r') as f:
+            state = json.load(f)
+        return {
+            "stats_io_ms": float(state.get("stats_io_ms", 0.0)),
+            "deferred_streak": int(state.get("deferred_streak", 0)),
+        }
+    except (json.JSONDecodeError, IOError, ValueError, TypeError, AttributeError):
+        return {"stats_io_ms": 0.0, "deferred_streak": 0}
+
+
+def save_metrics_state(state: dict) -> bool:
+    """Save the hook's deferral state to file."""
+    state_path = get_metrics_state_path()
+
+    # Write aside and rename, so concurrent readers never see a partial file
+    tmp_path = f"{state_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def update_metrics_state(state: dict, timings: dict[str, float], deferred: bool,
+                         deadline_ms: float) -> bool:
+    """Fold one call into the deferral state; save it only if a decision changes.
+
+    Rewriting the file costs more than the rest of the bookkeeping, so it is
+    skipped while the streak stays at zero and stats I/O stays on the same
+    side of the deadline. The stored time may then be stale, but never in a
+    way should_defer can tell apart.
+    """
+    streak = state["deferred_streak"] + 1 if deferred else 0
+    stats_io_ms = timings.get("stats_io", state["stats_io_ms"])
+
+    crossed = (stats_io_ms > deadline_ms) != (state["stats_io_ms"] > deadline_ms)
+    if streak == state["deferred_streak"] and not crossed:
+        return True
+    return save_metrics_state({"stats_io_ms": round(stats_io_ms, 3), "deferred_streak": streak})
+
+
+def save_metrics(metrics: dict) -> bool:
+    """Save metrics to file."""
+    metrics_path = get_metrics_path()
+
+    # Write aside and rename, so concurrent readers never see a partial file
+    tmp_path = f"{metrics_path}.{os.getpid()}.tmp"
+    try:
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(metrics_path), exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump(metrics, f, separators=(',', ':'))
+        os.replace(tmp_path, metrics_path)
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def _compact_metrics(timings: dict[str, float], deferred: bool, start: float) -> bool:
+    """Fold the log and this call into metrics.json, then drop the log.
+
+    The log is renamed to a per-process file first so concurrent appends
+    start a new log and are not lost.
+    """
+    log_path = get_metrics_log_path()
+    claim_path = f"{log_path}.{os.getpid()}"
+
+    lines = claim_queue(log_path, claim_path)
+    if lines is None:
+        claim_path, lines = None, []
+
+    metrics = _load_summary()
+    _fold_log(metrics, lines)
+    timings["metrics"] = timings.get("metrics", 0.0) + (time.perf_counter() - start) * 1000
+    update_metrics(metrics, timings, deferred)
+
+    saved = save_metrics(metrics)
+    if claim_path is not None:
+        try:
+            if not saved:
+                # Put the calls back so the next compaction folds them
+                with open_queue(log_path) as f:
+                    f.writelines(lines)
+            os.remove(claim_path)
+        except (IOError, OSError):
+            pass
+    return saved
+
+
+def _log_size(log_path: str) -> int:
+    """Get the size of the metrics log in bytes, 0 if missing."""
+    try:
+        return os.stat(log_path).st_size
+    except OSError:
+        return 0
+
+
+def record_metrics(state: dict, timings: dict[str, float], deferred: bool = False,
+                   deadline_ms: float = DEFAULT_DEADLINE_MS) -> bool:
+    """Persist one hook call's timings and update the deferral state.
+
+    Normally a single compact line is appended to the log; once the log
+    reaches COMPACT_LOG_BYTES it is folded into metrics.json. Opening the
+    file (the part that stalls on a slow disk) is included in the "metrics"
+    phase of the line being written.
+    """
+    start = time.perf_counter()
+    log_path = get_metrics_log_path()
+    update_metrics_state(state, timings, deferred, deadline_ms)
+
+    if _log_size(log_path) >= COMPACT_LOG_BYTES:
+        # Compact under the stats lock; if another process holds it, just append
+        acquired, lock = lock_stats(timeout_s=0)
+        if acquired:
+            try:
+                return _compact_metrics(timings, deferred, start)
+            finally:
+                if lock is not None:
+                    lock.close()
+
+    try:
+        with open_queue(log_path) as f:
+            timings["metrics"] = timings.get("metrics", 0.0) + (time.perf_counter() - start) * 1000
+            entry = {"t": {phase: round(ms, 3) for phase, ms in timings.items()}, "d": int(deferred)}
+            f.write(json.dumps(entry, separators=(',', ':')) + '\n')
+        return True
+    except IOError:
+        return False
+
+
+def get_deadline_ms(config: dict) -> float:
+    """Get the per-phase deadline in milliseconds from config."""
+    try:
+        deadline = float(config.get("hook_deadline_ms", DEFAULT_DEADLINE_MS))
+    except (TypeError, ValueError):
+        return DEFAULT_DEADLINE_MS
+    return deadline if deadline > 0 else DEFAULT_DEADLINE_MS
+
+
+def get_lock_timeout_s(timings: dict[str, float], deadline_ms: float) -> float:
+    """Get how long stats I/O may wait for the lock before the deadline."""
+    return max(0.0, deadline_ms - sum(timings.values())) / 1000
+
+
+def should_defer(timings: dict[str, float], state: dict, deadline_ms: float) -> bool:
+    """Decide whether to skip stats I/O and defer the event.
+
+    Defers when a phase of this call already exceeded the deadline, or when
+    stats I/O on the last full write did. After MAX_DEFERRED_STREAK deferrals
+    in a row stats I/O is always attempted, which replays the queue and lets
+    the hook recover once the disk does.
+    """
+    if state["deferred_streak"] >= MAX_DEFERRED_STREAK:
+        return False
+
+    if any(elapsed > deadline_ms for elapsed in timings.values()):
+        return True
+
+    return state["stats_io_ms"] > deadline_ms
+
+
+def update_metrics(metrics: dict, timings: dict[str, float],
+                   deferred: bool = False) -> dict:
+    """Fold one hook invocation's timings into the metrics."""
+    metrics["calls"] += 1
+    if deferred:
+        metrics["deferred"] += 1
+
+    for phase, elapsed in timings.items():
+        if phase not in metrics["phases"]:
+            continue
+        entry = metrics["phases"][phase]
+        entry["count"] += 1
+        entry["total_ms"] += elapsed
+        entry["max_ms"] = max(entry["max_ms"], elapsed)
+        entry["last_ms"] = elapsed
+
+    return metrics
+
+
+def format_metrics_output(metrics: dict | None = None) -> str:
+    """Format hook self-metrics for display."""
+    if metrics is None:
+        metrics = load_metrics()
+
+    if metrics["calls"] == 0:
+        return "No hook timings recorded yet."
+
+    lines = []
+    lines.append(f"\033[1m\033[36m{'=' * 50}\033[0m")
+    lines.append(f"\033[1m\033[36m  HOOK SELF-METRICS\033[0m")
+    lines.append(f"\033[1m\033[36m{'=' * 50}\033[0m")
+    lines.append("")
+    lines.append(f"  \033[2m{'Phase':16} {'avg ms':>8} {'max ms':>8} {'last ms':>8}\033[0m")
+
+    for phase in PHASES:
+        entry = metrics["phases"][phase]
+        if entry["count"] == 0:
+            continue
+        avg = entry["total_ms"] / entry["count"]
+        label = PHASE_LABELS.get(phase, phase)
+        lines.append(f"  {label:16} {avg:8.2f} {entry['max_ms']:8.2f} {entry['last_ms']:8.2f}")
+
+    lines.append("")
+    lines.append(f"  Calls: {metrics['calls']}")
+    lines.append(f"  Deferred (fast path): {metrics['deferred']}")
+    lines.append(f"  Waiting in deferred queue: {count_deferred_usage()}")
+    lines.append(f"\033[1m\033[36m{'=' * 50}\033[0m")
+
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    print(format_metrics_output())
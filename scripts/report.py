@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+HTML report generator for claude-tool-tracker plugin.
+Builds a single self-contained HTML file from the stats store.
+"""
+
+import json
+import re
+from datetime import date, timedelta
+from html import escape
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# Import stats for loading and aggregation
+import sys
+sys.path.insert(0, str(Path(__file__).parent))
+from stats import load_stats, get_subcategory_breakdown, format_estimate, get_error_margin
+
+REPORT_FILENAME = "tool-report.html"
+
+# Category display config: (label, color)
+CATEGORY_CONFIG = {
+    "native": ("Native Tools", "#58a6ff"),
+    "mcp": ("MCP Servers", "#39c5cf"),
+    "agent": ("Agents", "#a371f7"),
+    "skill": ("Skills", "#d29922"),
+    "command": ("Commands", "#3fb950"),
+}
+
+# Subcategories shown per category in the breakdown
+TOP_SUBCATEGORIES = 10
+
+TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Claude Tool Tracker Report</title>
+<style>
+:root{--bg:#0d1117;--bg2:#161b22;--bg3:#21262d;--text:#f0f6fc;--muted:#8b949e;--border:#30363d}
+*{margin:0;padding:0;box-sizing:border-box}
+body{font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',sans-serif;background:var(--bg);color:var(--text);line-height:1.5;padding:32px 24px}
+main{max-width:960px;margin:0 auto}
+h1{font-size:1.6rem;margin-bottom:4px}
+h2{font-size:1.1rem;margin:32px 0 12px}
+.muted{color:var(--muted);font-size:.9rem}
+.card{background:var(--bg2);border:1px solid var(--border);border-radius:8px;padding:16px}
+.row{display:grid;grid-template-columns:140px 1fr 110px;gap:12px;align-items:center;padding:4px 0;font-size:.9rem}
+.bar{height:10px;border-radius:5px;background:var(--bg3)}
+.bar span{display:block;height:100%;border-radius:5px}
+.num{text-align:right;font-family:ui-monospace,monospace}
+.cats{display:grid;grid-template-columns:repeat(auto-fit,minmax(260px,1fr));gap:12px}
+.cats h3{font-size:.95rem;margin-bottom:8px}
+.cats .row{grid-template-columns:1fr 90px}
+svg{width:100%;height:120px;display:block}
+details{border-top:1px solid var(--border);padding:8px 0}
+summary{cursor:pointer;font-size:.95rem}
+table{width:100%;border-collapse:collapse;margin:8px 0 12px;font-size:.85rem}
+td{padding:2px 8px;border-bottom:1px solid var(--bg3)}
+td:last-child{text-align:right;font-family:ui-monospace,monospace}
+caption{text-align:left;font-weight:600;padding:4px 8px;color:var(--muted)}
+</style>
+</head>
+<body>
+<main>
+<h1>Claude Tool Tracker Report</h1>
+<p class="muted">__SUMMARY__</p>
+<h2>Categories</h2>
+<div class="card">__CATEGORIES__</div>
+<h2>Daily Trend</h2>
+<div class="card">__TREND__</div>
+<h2>Breakdown</h2>
+<div class="cats">__BREAKDOWN__</div>
+<h2>Sessions</h2>
+<div class="card">__SESSIONS__</div>
+</main>
+__CHUNKS__
+<script>
+document.querySelectorAll('details[data-chunk]').forEach(function (el) {
+  el.addEventListener('toggle', function () {
+    if (!el.open || el.dataset.loaded) return;
+    el.dataset.loaded = '1';
+    var days = JSON.parse(document.getElementById('chunk-' + el.dataset.chunk).textContent);
+    var html = '';
+    Object.keys(days).sort().reverse().forEach(function (day) {
+      html += '<table><caption>' + day + '</caption>';
+      days[day].forEach(function (t) {
+        var name = String(t[0]).replace(/&/g, '&amp;').replace(/</g, '&lt;');
+        var count = t.length > 2 ? t[1] + ' \u00b1' + t[2] : t[1];
+        html += '<tr><td>' + name + '</td><td>' + count + '</td></tr>';
+      });
+      html += '</table>';
+    });
+    el.insertAdjacentHTML('beforeend', html);
+  });
+});
+</script>
+</body>
+</html>
+"""
+
+
+def _render_categories(totals: Dict[str, Any]) -> str:
+    """Render category totals as static bars."""
+    categories = totals.get("categories", {})
+    category_variance = totals.get("variance", {}).get("categories", {})
+    max_count = max(categories.values()) if categories else 0
+
+    rows = []
+    for cat, (label, color) in CATEGORY_CONFIG.items():
+        count = categories.get(cat, 0)
+        if count == 0:
+            continue
+        width = count / max_count * 100 if max_count > 0 else 0
+        estimate = format_estimate(count, category_variance.get(cat, 0))
+        rows.append(
+            f'<div class="row"><span>{label}</span>'
+            f'<div class="bar"><span style="width:{width:.1f}%;background:{color}"></span></div>'
+            f'<span class="num">{estimate}</span></div>'
+        )
+    return ''.join(rows) or '<p class="muted">No tool usage recorded yet.</p>'
+
+
+def _render_breakdown(totals: Dict[str, Any]) -> str:
+    """Render top subcategories for each category."""
+    breakdown = get_subcategory_breakdown(totals.get("tools", {}))
+    variance_breakdown = get_subcategory_breakdown(totals.get("variance", {}).get("tools", {}))
+
+    cards = []
+    for cat, (label, color) in CATEGORY_CONFIG.items():
+        subcats = breakdown.get(cat, {})
+        if not subcats:
+            continue
+        sorted_subcats = sorted(subcats.items(), key=lambda x: x[1], reverse=True)
+        rows = []
+        for subcat, count in sorted_subcats[:TOP_SUBCATEGORIES]:
+            estimate = format_estimate(count, variance_breakdown.get(cat, {}).get(subcat, 0))
+            rows.append(f'<div class="row"><span>{escape(subcat)}</span><span class="num">{estimate}</span></div>')
+        cards.append(f'<div class="card"><h3 style="color:{color}">{label}</h3>{"".join(rows)}</div>')
+    return ''.join(cards)
+
+
+def _render_trend(sessions: Dict[str, Any]) -> str:
+    """Render daily totals as an inline SVG bar chart.
+
+    Covers every day from the first to the last session, with zero for days
+    without activity, so bar spacing reflects real time.
+    """
+    daily = {}
+    for day, session in sessions.items():
+        try:
+            daily[date.fromisoformat(day)] = sum(session.get("categories", {}).values())
+        except ValueError:
+            continue
+    if not daily:
+        return '<p class="muted">No sessions recorded yet.</p>'
+
+    first, last = min(daily), max(daily)
+    days = [(first + timedelta(days=i)).isoformat() for i in range((last - first).days + 1)]
+    totals = [daily.get(first + timedelta(days=i), 0) for i in range(len(days))]
+    max_total = max(totals) or 1
+    width = len(days)
+
+    bars = []
+    for i, (day, total) in enumerate(zip(days, totals)):
+        if total == 0:
+            continue
+        height = total / max_total * 100
+        bars.append(
+            f'<rect x="{i}" y="{100 - height:.1f}" width="0.8" height="{height:.1f}" fill="#58a6ff">'
+            f'<title>{day}: {round(total)}</title></rect>'
+        )
+    return (
+        f'<svg viewBox="0 0 {width} 100" preserveAspectRatio="none">{"".join(bars)}</svg>'
+        f'<p class="muted">{days[0]} – {days[-1]}</p>'
+    )
+
+
+def _build_chunks(sessions: Dict[str, Any]) -> Dict[str, Dict[str, list]]:
+    """Group per-session tool counts into monthly chunks.
+
+    Each day maps to [tool, count] pairs sorted by count, which keeps the
+    embedded JSON small and ready to render. Sampled tools get a third
+    element with their 95% error margin.
+    """
+    chunks = {}
+    for day, session in sessions.items():
+        variance = session.get("variance", {}).get("tools", {})
+        tools = sorted(session.get("tools", {}).items(), key=lambda x: x[1], reverse=True)
+        entries = []
+        for name, count in tools:
+            entry = [name, round(count)]
+            margin = round(get_error_margin(variance.get(name, 0)))
+            if margin > 0:
+                entry.append(margin)
+            entries.append(entry)
+        chunks.setdefault(day[:7], {})[day] = entries
+    return chunks
+
+
+def _render_sessions(sessions: Dict[str, Any], chunks: Dict[str, Dict[str, list]]) -> tuple:
+    """Render collapsed month sections and their lazily parsed data blocks."""
+    sections = []
+    scripts = []
+    for month in sorted(chunks, reverse=True):
+        days = chunks[month]
+        total = sum(sum(sessions[day].get("categories", {}).values()) for day in days)
+        sections.append(
+            f'<details data-chunk="{escape(month)}"><summary>{escape(month)} '
+            f'<span class="muted">· {len(days)} days · {round(total)} calls</span></summary></details>'
+        )
+        # Data blocks are not executed; they are only parsed when expanded
+        payload = json.dumps(days, separators=(',', ':')).replace('</', '<\\/')
+        scripts.append(f'<script type="application/json" id="chunk-{escape(month)}">{payload}</script>')
+
+    if not sections:
+        return '<p class="muted">No sessions recorded yet.</p>', ''
+    return ''.join(sections), '\n'.join(scripts)
+
+
+def build_report(stats: Optional[Dict[str, Any]] = None) -> str:
+    """Build the HTML report from statistics."""
+    if stats is None:
+        stats = load_stats(include_deferred=True)
+
+    totals = stats.get("totals", {})
+    sessions = stats.get("sessions", {})
+    total = sum(totals.get("categories", {}).values())
+
+    if sessions:
+        days = sorted(sessions)
+        summary = f"{round(total)} tool calls across {len(days)} days ({days[0]} – {days[-1]})"
+    else:
+        summary = f"{round(total)} tool calls"
+
+    chunks = _build_chunks(sessions)
+    session_html, chunk_scripts = _render_sessions(sessions, chunks)
+
+    replacements = {
+        "__SUMMARY__": summary,
+        "__CATEGORIES__": _render_categories(totals),
+        "__TREND__": _render_trend(sessions),
+        "__BREAKDOWN__": _render_breakdown(totals),
+        "__SESSIONS__": session_html,
+        "__CHUNKS__": chunk_scripts,
+    }
+
+    # Single pass so tool names can never be mistaken for placeholders
+    return re.sub(r"__[A-Z]+__", lambda m: replacements.get(m.group(0), m.group(0)), TEMPLATE)
+
+
+def write_report(output_path: Optional[Path] = None) -> Path:
+    """Write the HTML report and return its path."""
+    if output_path is None:
+        output_path = Path.cwd() / REPORT_FILENAME
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_text(build_report(), encoding="utf-8")
+    return output_path
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    print(f"Report written to {write_report(target)}")
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Adaptive sampling for claude-tool-tracker plugin.
+Records high-volume tool calls at a rate that keeps hook overhead within budget.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+
+# Import stats for recording and stats location
+import sys
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stats import (get_stats_dir, record_tool_usage, write_tool_usage, defer_tool_usage,
+                   lock_stats, LOCK_TIMEOUT_S)
+
+SAMPLING_FILENAME = "sampling.json"
+
+# Rare categories are always recorded; only these are sampled
+SAMPLED_CATEGORIES = ["native"]
+
+# Never drop below this rate so estimates stay usable
+MIN_SAMPLING_RATE = 0.01
+
+# Smoothing factor for the moving averages of fixed and recording cost
+COST_SMOOTHING = 0.2
+
+DEFAULT_BUDGET_MS = 5.0
+
+
+def get_sampling_state_path() -> str:
+    """Get path to sampling state file (next to the stats file)."""
+    return os.path.join(get_stats_dir(), SAMPLING_FILENAME)
+
+
+def load_sampling_state() -> dict:
+    """Load sampling state from file."""
+    state_path = get_sampling_state_path()
+
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        return {
+            "rate": float(state.get("rate", 1.0)),
+            "fixed_ms": float(state.get("fixed_ms", 0.0)),
+            "cost_ms": float(state.get("cost_ms", 0.0)),
+        }
+    except (json.JSONDecodeError, IOError, ValueError, TypeError, AttributeError):
+        return {"rate": 1.0, "fixed_ms": 0.0, "cost_ms": 0.0}
+
+
+def save_sampling_state(state: dict) -> bool:
+    """Save sampling state to file."""
+    state_path = get_sampling_state_path()
+
+    # Write aside and rename, so concurrent readers never see a partial file
+    tmp_path = f"{state_path}.{os.getpid()}.tmp"
+    try:
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def get_budget_ms(config: dict) -> float:
+    """Get the per-call overhead budget in milliseconds from config."""
+    try:
+        budget = float(config.get("sampling_budget_ms", DEFAULT_BUDGET_MS))
+    except (TypeError, ValueError):
+        return DEFAULT_BUDGET_MS
+    return budget if budget > 0 else DEFAULT_BUDGET_MS
+
+
+def _smooth(average: float, sample: float) -> float:
+    """Fold a new sample into an exponential moving average."""
+    if average > 0:
+        return COST_SMOOTHING * sample + (1 - COST_SMOOTHING) * average
+    return sample
+
+
+def _random() -> float:
+    """Uniform random number in [0, 1), without importing random."""
+    return int.from_bytes(os.urandom(7), "big") / (1 << 56)
+
+
+def adjust_rate(state: dict, fixed_ms: float, record_ms: float, budget_ms: float) -> dict:
+    """Update the cost averages and derive the next sampling rate.
+
+    Every sampled-category call pays fixed_ms (state read and the sampling
+    decision); recorded calls additionally pay record_ms (stats rewrite plus
+    the state save). Expected overhead per call is fixed + rate * record, so
+    the rate that meets the budget is (budget - fixed) / record, clamped to
+    [MIN_SAMPLING_RATE, 1].
+    """
+    fixed_avg = _smooth(state.get("fixed_ms", 0.0), fixed_ms)
+    cost_avg = _smooth(state.get("cost_ms", 0.0), record_ms)
+
+    if cost_avg > 0:
+        rate = (budget_ms - fixed_avg) / cost_avg
+    else:
+        rate = 1.0
+    rate = max(MIN_SAMPLING_RATE, min(1.0, rate))
+
+    return {"rate": rate, "fixed_ms": fixed_avg, "cost_ms": cost_avg}
+
+
+def record_sampled_tool_usage(tool_name: str, category: str, config: dict,
+                              lock_timeout_s: float = LOCK_TIMEOUT_S) -> tuple:
+    """Record a tool usage subject to adaptive sampling.
+
+    Returns (weight, deferred): the inverse-probability weight the call was
+    recorded with, or None if the call was skipped, and whether the stats
+    lock was contended so the event went to the deferred queue instead.
+    """
+    if category not in SAMPLED_CATEGORIES:
+        return 1.0, not record_tool_usage(tool_name, lock_timeout_s=lock_timeout_s)
+
+    start = time.perf_counter()
+    state = load_sampling_state()
+    rate = state["rate"]
+    sampled = _random() < rate
+    decided = time.perf_counter()
+
+    if not sampled:
+        return None, False
+
+    weight = 1.0 / rate
+    acquired, lock = lock_stats(lock_timeout_s)
+    if not acquired:
+        # Contention says nothing about recording cost, so leave the averages
+        defer_tool_usage(tool_name, weight)
+        return weight, True
+
+    # Time the write only once the lock is held; waiting on another
+    # writer would inflate the cost average and crash the rate
+    locked = time.perf_counter()
+    try:
+        write_tool_usage(tool_name, weight)
+    finally:
+        if lock is not None:
+            lock.close()
+    recorded = time.perf_counter()
+
+    # The state save can't be timed before it is written, so the state read
+    # (same tiny file) stands in for it in the recording cost.
+    fixed_ms = (decided - start) * 1000
+    record_ms = (recorded - locked) * 1000 + fixed_ms
+    save_sampling_state(adjust_rate(state, fixed_ms, record_ms, get_budget_ms(config)))
+
+    return weight, False
+
+
+if __name__ == "__main__":
+    # Show current sampling state
+    print("Sampling state:", load_sampling_state())
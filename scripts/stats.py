@@ -4,43 +4,72 @@ Statistics manager for claude-tool-tracker plugin.
 Handles tracking and persisting tool usage statistics.
 """
 
+from __future__ import annotations
+
 import json
+import math
 import os
-from datetime import datetime
-from pathlib import Path
-from typing import Dict, Any, Optional
+import time
 
 # Import config to get stats location
 import sys
-sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from config import get_stats_location
 
 STATS_DIR_NAME = "claude-tool-tracker"
 STATS_FILENAME = "stats.json"
+DEFERRED_FILENAME = "deferred.jsonl"
 
+# ISO 8601 local time; built with time.strftime so datetime stays unimported
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+LOCK_FILENAME = "stats.lock"
 
-def get_stats_path() -> Path:
-    """Get path to stats file based on configuration."""
+# Longest the hook waits for another process's stats write
+LOCK_TIMEOUT_S = 1.0
+
+
+def get_stats_dir() -> str:
+    """Get directory holding the stats file and its companions."""
     location = get_stats_location()
 
     if location == "local":
-        base_path = Path.cwd() / ".claude" / STATS_DIR_NAME
+        return os.path.join(os.getcwd(), ".claude", STATS_DIR_NAME)
     else:  # global
-        base_path = Path.home() / ".claude" / STATS_DIR_NAME
+        return os.path.join(os.path.expanduser("~"), ".claude", STATS_DIR_NAME)
+
 
-    return base_path / STATS_FILENAME
+def get_stats_path() -> str:
+    """Get path to stats file based on configuration."""
+    return os.path.join(get_stats_dir(), STATS_FILENAME)
 
 
 def get_current_session_id() -> str:
     """Get or create current session ID based on date."""
-    return datetime.now().strftime("%Y-%m-%d")
+    return time.strftime("%Y-%m-%d")
+
+
+def _now_timestamp() -> str:
+    """Get the current local time as an ISO 8601 string."""
+    return time.strftime(TIMESTAMP_FORMAT)
+
+
+def load_stats(include_deferred: bool = False) -> dict:
+    """Load statistics from file.
+
+    With include_deferred, events still waiting in the fast-path queue are
+    applied to the returned statistics (the file is left untouched).
+    """
+    stats = _load_stats_file()
+    if include_deferred:
+        _apply_deferred_usage(stats, read_deferred_usage())
+    return stats
 
 
-def load_stats() -> Dict[str, Any]:
-    """Load statistics from file."""
+def _load_stats_file() -> dict:
+    """Load statistics from file as stored."""
     stats_path = get_stats_path()
 
-    if not stats_path.exists():
+    if not os.path.exists(stats_path):
         return {
             "sessions": {},
             "totals": {
@@ -74,21 +103,105 @@ def load_stats() -> Dict[str, Any]:
         }
 
 
-def save_stats(stats: Dict[str, Any]) -> bool:
+def save_stats(stats: dict) -> bool:
     """Save statistics to file."""
     stats_path = get_stats_path()
 
-    # Ensure directory exists
-    stats_path.parent.mkdir(parents=True, exist_ok=True)
-
+    # Write aside and rename, so concurrent readers never see a partial file
+    tmp_path = f"{stats_path}.{os.getpid()}.tmp"
     try:
-        with open(stats_path, 'w') as f:
+        # Ensure directory exists
+        os.makedirs(os.path.dirname(stats_path), exist_ok=True)
+        with open(tmp_path, 'w') as f:
             json.dump(stats, f, indent=2)
+        os.replace(tmp_path, stats_path)
         return True
-    except IOError:
+    except (IOError, OSError):
         return False
 
 
+def lock_stats(timeout_s: float = LOCK_TIMEOUT_S) -> tuple:
+    """Take the exclusive stats write lock.
+
+    Returns (acquired, handle); close handle to release. Gives up after
+    timeout_s so a contended lock can't stall the hook. Where fcntl is
+    unavailable (Windows) writes proceed unlocked.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        return True, None
+
+    stats_dir = get_stats_dir()
+    try:
+        os.makedirs(stats_dir, exist_ok=True)
+        handle = open(os.path.join(stats_dir, LOCK_FILENAME), 'a')
+    except (IOError, OSError):
+        return True, None
+
+    deadline = time.monotonic() + timeout_s
+    while True:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True, handle
+        except OSError:
+            if time.monotonic() >= deadline:
+                handle.close()
+                return False, None
+            time.sleep(0.005)
+
+
+def open_queue(path: str):
+    """Open an append-only queue file, locked against a concurrent claim.
+
+    Queues are claimed by renaming them aside (see claim_queue). An append
+    that raced with a claim would land in the claimed file after it was
+    read, so appends hold a lock on the file, and an append that finds its
+    file already renamed away retries on the new one. Close the returned
+    file to release the lock.
+    """
+    try:
+        import fcntl
+    except ImportError:
+        fcntl = None
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        f = open(path, 'a')
+        if fcntl is None:
+            return f
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            if os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                return f
+        except OSError:
+            pass
+        f.close()
+
+
+def claim_queue(path: str, claim_path: str) -> list | None:
+    """Rename a queue aside and return its lines, or None if there is none.
+
+    Waits for appends already holding the queue's lock, so no line can be
+    written to the claimed file after it has been read.
+    """
+    try:
+        os.replace(path, claim_path)
+    except OSError:
+        return None
+
+    try:
+        with open(claim_path, 'r') as f:
+            try:
+                import fcntl
+                fcntl.flock(f, fcntl.LOCK_EX)
+            except ImportError:
+                pass
+            return f.readlines()
+    except (IOError, OSError):
+        return []
+
+
 def categorize_tool(tool_name: str) -> str:
     """Determine the category of a tool.
 
@@ -124,16 +237,32 @@ def parse_detailed_tool_name(tool_name: str) -> tuple:
     return (category, subcategory, detail)
 
 
-def record_tool_usage(tool_name: str) -> None:
-    """Record a tool usage in statistics."""
-    stats = load_stats()
-    session_id = get_current_session_id()
+def _add_weighted(bucket: dict, tool_name: str, category: str, weight: float) -> None:
+    """Add a weighted observation to a session or totals bucket.
+
+    Sampled calls carry weight 1/p (Horvitz-Thompson), and each contributes
+    w * (w - 1) to the variance of the estimate. Unsampled calls (w = 1)
+    contribute no variance, so the variance block is only created when needed.
+    """
+    bucket["tools"][tool_name] = bucket["tools"].get(tool_name, 0) + weight
+    bucket["categories"][category] = bucket["categories"].get(category, 0) + weight
+
+    variance = weight * (weight - 1)
+    if variance > 0:
+        var_bucket = bucket.setdefault("variance", {"tools": {}, "categories": {}})
+        var_bucket["tools"][tool_name] = var_bucket["tools"].get(tool_name, 0) + variance
+        var_bucket["categories"][category] = var_bucket["categories"].get(category, 0) + variance
+
+
+def _apply_tool_usage(stats: dict, tool_name: str, weight: float, timestamp: str) -> None:
+    """Apply one tool usage (with its ISO timestamp) to loaded statistics."""
+    session_id = timestamp[:10]
     category = categorize_tool(tool_name)
 
     # Initialize session if needed
     if session_id not in stats["sessions"]:
         stats["sessions"][session_id] = {
-            "start": datetime.now().isoformat(),
+            "start": timestamp,
             "end": None,
             "tools": {},
             "categories": {
@@ -148,21 +277,147 @@ def record_tool_usage(tool_name: str) -> None:
     session = stats["sessions"][session_id]
 
     # Update session stats
-    session["tools"][tool_name] = session["tools"].get(tool_name, 0) + 1
-    session["categories"][category] = session["categories"].get(category, 0) + 1
-    session["end"] = datetime.now().isoformat()
+    _add_weighted(session, tool_name, category, weight)
+    if session["end"] is None or timestamp > session["end"]:
+        session["end"] = timestamp
 
     # Update totals
-    stats["totals"]["tools"][tool_name] = stats["totals"]["tools"].get(tool_name, 0) + 1
-    stats["totals"]["categories"][category] = stats["totals"]["categories"].get(category, 0) + 1
+    _add_weighted(stats["totals"], tool_name, category, weight)
 
-    save_stats(stats)
 
+def record_tool_usage(tool_name: str, weight: float = 1, lock_timeout_s: float = LOCK_TIMEOUT_S) -> bool:
+    """Record a tool usage in statistics.
 
-def get_session_stats(session_id: Optional[str] = None) -> Dict[str, Any]:
-    """Get statistics for a specific session or current session."""
+    weight is the inverse sampling probability; 1 for unsampled calls.
+    If the stats lock can't be taken within lock_timeout_s the event is
+    deferred instead. Returns True if written to stats, False if deferred.
+    """
+    acquired, lock = lock_stats(lock_timeout_s)
+    if not acquired:
+        defer_tool_usage(tool_name, weight)
+        return False
+
+    try:
+        write_tool_usage(tool_name, weight)
+    finally:
+        if lock is not None:
+            lock.close()
+    return True
+
+
+def write_tool_usage(tool_name: str, weight: float = 1) -> bool:
+    """Load, update and save statistics; the caller holds the stats lock.
+
+    Any events deferred by the hook's fast path are replayed in the same write.
+    """
     stats = load_stats()
 
+    replay_path, events = _claim_deferred_usage()
+    _apply_deferred_usage(stats, events)
+    _apply_tool_usage(stats, tool_name, weight, _now_timestamp())
+
+    saved = save_stats(stats)
+    _release_deferred_usage(replay_path, saved)
+    return saved
+
+
+def _apply_deferred_usage(stats: dict, events: list) -> None:
+    """Apply queued tool usage events to loaded statistics."""
+    for event in events:
+        try:
+            timestamp = event["time"]
+            if not isinstance(timestamp, str) or len(timestamp) < 10:
+                continue
+            _apply_tool_usage(stats, event["tool"], event.get("weight", 1), timestamp)
+        except (KeyError, TypeError, AttributeError):
+            continue
+
+
+def get_deferred_path() -> str:
+    """Get path to the queue of events deferred by the hook's fast path."""
+    return os.path.join(get_stats_dir(), DEFERRED_FILENAME)
+
+
+def defer_tool_usage(tool_name: str, weight: float = 1) -> bool:
+    """Queue a tool usage without touching the stats file.
+
+    Appends a single line, which is much cheaper than rewriting stats.json.
+    """
+    deferred_path = get_deferred_path()
+    event = {"tool": tool_name, "weight": weight, "time": _now_timestamp()}
+
+    try:
+        with open_queue(deferred_path) as f:
+            f.write(json.dumps(event) + '\n')
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def _parse_deferred_lines(lines: list) -> list:
+    """Parse queued event lines, skipping any that are corrupt."""
+    events = []
+    for line in lines:
+        try:
+            events.append(json.loads(line))
+        except json.JSONDecodeError:
+            continue
+    return events
+
+
+def read_deferred_usage() -> list:
+    """Return queued tool usage events without removing them."""
+    try:
+        with open(get_deferred_path(), 'r') as f:
+            return _parse_deferred_lines(f.readlines())
+    except IOError:
+        return []
+
+
+def _claim_deferred_usage() -> tuple:
+    """Move the queue aside for replay and return (replay_path, events).
+
+    The queue is renamed to a per-process file, so concurrent appends start a
+    new queue and concurrent replays never touch each other's file.
+    """
+    deferred_path = get_deferred_path()
+    replay_path = f"{deferred_path}.{os.getpid()}.replaying"
+
+    lines = claim_queue(deferred_path, replay_path)
+    if lines is None:
+        return None, []
+    return replay_path, _parse_deferred_lines(lines)
+
+
+def _release_deferred_usage(replay_path: str | None, saved: bool) -> None:
+    """Finish a replay: drop the claimed file once saved, else requeue it."""
+    if replay_path is None:
+        return
+
+    try:
+        if not saved:
+            # Put the events back so the next write can replay them
+            with open(replay_path, 'r') as src, open_queue(get_deferred_path()) as dst:
+                dst.write(src.read())
+        os.remove(replay_path)
+    except (IOError, OSError):
+        # Leave the claimed file in place rather than lose its events
+        pass
+
+
+def count_deferred_usage() -> int:
+    """Count tool usage events waiting in the deferred queue."""
+    try:
+        with open(get_deferred_path(), 'r') as f:
+            return sum(1 for line in f if line.strip())
+    except IOError:
+        return 0
+
+
+def get_session_stats(session_id: str | None = None) -> dict:
+    """Get statistics for a specific session or current session."""
+    stats = load_stats(include_deferred=True)
+
     if session_id is None:
         session_id = get_current_session_id()
 
@@ -172,9 +427,9 @@ def get_session_stats(session_id: Optional[str] = None) -> Dict[str, Any]:
     })
 
 
-def get_total_stats() -> Dict[str, Any]:
+def get_total_stats() -> dict:
     """Get total statistics across all sessions."""
-    stats = load_stats()
+    stats = load_stats(include_deferred=True)
     return stats["totals"]
 
 
@@ -228,6 +483,19 @@ def get_subcategory_breakdown(tools: dict) -> dict:
     return breakdown
 
 
+def get_error_margin(variance: float) -> float:
+    """Get the 95% confidence half-width for an estimate with given variance."""
+    return 1.96 * math.sqrt(variance) if variance > 0 else 0.0
+
+
+def format_estimate(count: float, variance: float = 0) -> str:
+    """Format an (estimated) count, with an error bar when it was sampled."""
+    margin = get_error_margin(variance)
+    if margin >= 0.5:
+        return f"{round(count)} ±{round(margin)}"
+    return f"{round(count)}"
+
+
 def format_stats_output(session_only: bool = True) -> str:
     """Format statistics for display with subcategory breakdown."""
     if session_only:
@@ -239,13 +507,17 @@ def format_stats_output(session_only: bool = True) -> str:
 
     categories = stats.get("categories", {})
     tools = stats.get("tools", {})
+    variance = stats.get("variance", {})
+    category_variance = variance.get("categories", {})
     total = sum(categories.values())
+    total_variance = sum(category_variance.values())
 
     if total == 0:
         return f"No tool usage recorded yet for {'this session' if session_only else 'all time'}."
 
     # Get subcategory breakdown
     breakdown = get_subcategory_breakdown(tools)
+    variance_breakdown = get_subcategory_breakdown(variance.get("tools", {}))
 
     # Build output
     lines = []
@@ -274,25 +546,31 @@ def format_stats_output(session_only: bool = True) -> str:
         bar_len = int((count / max_count) * bar_width) if max_count > 0 else 0
         bar = '\u2588' * bar_len
         percentage = (count / total * 100) if total > 0 else 0
-        lines.append(f"  {color}{label:15}\033[0m {count:4} {color}{bar}\033[0m ({percentage:.1f}%)")
+        estimate = format_estimate(count, category_variance.get(cat, 0))
+        lines.append(f"  {color}{label:15}\033[0m {estimate:>4} {color}{bar}\033[0m ({percentage:.1f}%)")
 
         # Show subcategory breakdown
         subcats = breakdown.get(cat, {})
+        subcat_variance = variance_breakdown.get(cat, {})
         if subcats:
             # Sort by count descending
             sorted_subcats = sorted(subcats.items(), key=lambda x: x[1], reverse=True)
             for subcat, subcount in sorted_subcats[:5]:  # Top 5 per category
-                lines.append(f"    \033[2m└─ {subcat[:20]:20} ({subcount})\033[0m")
+                subestimate = format_estimate(subcount, subcat_variance.get(subcat, 0))
+                lines.append(f"    \033[2m└─ {subcat[:20]:20} ({subestimate})\033[0m")
 
         lines.append("")
 
-    lines.append(f"\033[1m  Total: {total} tool calls\033[0m")
+    if total_variance > 0:
+        lines.append(f"\033[1m  Total: ~{format_estimate(total, total_variance)} tool calls (sampled, 95% CI)\033[0m")
+    else:
+        lines.append(f"\033[1m  Total: {round(total)} tool calls\033[0m")
     lines.append(f"\033[1m\033[36m{'=' * 50}\033[0m")
 
     return '\n'.join(lines)
 
 
-def clear_session_stats(session_id: Optional[str] = None) -> bool:
+def clear_session_stats(session_id: str | None = None) -> bool:
     """Clear statistics for a specific session."""
     stats = load_stats()
 
@@ -307,5 +585,8 @@ def clear_session_stats(session_id: Optional[str] = None) -> bool:
 
 
 if __name__ == "__main__":
-    # Test stats
-    print(format_stats_output(session_only=True))
+    if "--self" in sys.argv[1:]:
+        from metrics import format_metrics_output
+        print(format_metrics_output())
+    else:
+        print(format_stats_output(session_only="--all" not in sys.argv[1:]))
@@ -0,0 +1,22 @@
+"""
+Shared fixtures for the plugin's tests.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import config
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """Point the global config and stats location at an empty home."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    config._config_cache.clear()
+    yield tmp_path
+    config._config_cache.clear()
@@ -0,0 +1,143 @@
+"""
+Tests for the hook's deferral fast path and replay of queued events.
+"""
+
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+import metrics
+import stats
+from metrics import MAX_DEFERRED_STREAK, load_metrics_state, should_defer, update_metrics_state
+from stats import (claim_queue, defer_tool_usage, get_deferred_path, get_stats_dir, load_stats, lock_stats,
+                   open_queue, read_deferred_usage, record_tool_usage)
+
+SCRIPTS = Path(__file__).parent.parent / "scripts"
+
+
+def leftover_files() -> list:
+    """Claimed replay files and temp files left in the stats directory."""
+    return [name for name in os.listdir(get_stats_dir()) if name.endswith((".replaying", ".tmp"))]
+
+
+def test_should_defer_when_a_phase_exceeds_deadline():
+    state = {"stats_io_ms": 1.0, "deferred_streak": 0}
+
+    assert should_defer({"config": 600.0}, state, 500.0)
+    assert not should_defer({"config": 10.0}, state, 500.0)
+
+
+def test_should_defer_after_slow_stats_io():
+    state = {"stats_io_ms": 800.0, "deferred_streak": 3}
+
+    assert should_defer({"config": 10.0}, state, 500.0)
+
+
+def test_should_defer_retries_after_max_streak():
+    state = {"stats_io_ms": 800.0, "deferred_streak": MAX_DEFERRED_STREAK}
+
+    assert not should_defer({"config": 600.0}, state, 500.0)
+
+
+def test_metrics_state_is_saved_only_when_a_decision_changes(home):
+    state = load_metrics_state()
+    assert state == {"stats_io_ms": 0.0, "deferred_streak": 0}
+
+    # Fast write on a fresh state: nothing should_defer could tell apart
+    update_metrics_state(state, {"stats_io": 1.0}, False, 500.0)
+    assert not os.path.exists(metrics.get_metrics_state_path())
+
+    update_metrics_state(state, {"stats_io": 800.0}, False, 500.0)
+    state = load_metrics_state()
+    assert state == {"stats_io_ms": 800.0, "deferred_streak": 0}
+
+    update_metrics_state(state, {"defer": 0.1}, True, 500.0)
+    assert load_metrics_state() == {"stats_io_ms": 800.0, "deferred_streak": 1}
+
+
+def test_deferred_events_replay_into_stats(home):
+    for _ in range(3):
+        defer_tool_usage("native:Read", 2)
+
+    assert record_tool_usage("native:Edit")
+
+    totals = load_stats()["totals"]
+    assert totals["tools"] == {"native:Read": 6, "native:Edit": 1}
+    assert totals["variance"]["tools"] == {"native:Read": 6}
+    assert not os.path.exists(get_deferred_path())
+    assert leftover_files() == []
+
+
+def test_failed_save_requeues_claimed_events(home, monkeypatch):
+    defer_tool_usage("native:Read")
+    defer_tool_usage("native:Grep")
+    monkeypatch.setattr(stats, "save_stats", lambda stats: False)
+
+    record_tool_usage("native:Edit")
+
+    assert [event["tool"] for event in read_deferred_usage()] == ["native:Read", "native:Grep"]
+    assert leftover_files() == []
+
+
+def test_contended_lock_defers_event(home):
+    acquired, lock = lock_stats()
+    assert acquired
+    try:
+        assert record_tool_usage("native:Read", lock_timeout_s=0) is False
+    finally:
+        lock.close()
+
+    assert [event["tool"] for event in read_deferred_usage()] == ["native:Read"]
+    assert not os.path.exists(stats.get_stats_path())
+
+
+def test_load_stats_includes_queued_events_on_request(home):
+    record_tool_usage("native:Read")
+    defer_tool_usage("native:Read")
+    defer_tool_usage("mcp:context7:get-library-docs")
+
+    assert load_stats()["totals"]["tools"] == {"native:Read": 1}
+
+    totals = load_stats(include_deferred=True)["totals"]
+    assert totals["tools"] == {"native:Read": 2, "mcp:context7:get-library-docs": 1}
+    assert totals["categories"]["mcp"] == 1
+    # Reading must leave the queue for the next write to replay
+    assert len(read_deferred_usage()) == 2
+
+
+def test_claim_waits_for_append_in_flight(home):
+    path = get_deferred_path()
+    claimed = []
+
+    append = open_queue(path)
+    claimer = threading.Thread(target=lambda: claimed.append(claim_queue(path, path + ".claimed")))
+    claimer.start()
+    claimer.join(timeout=0.2)
+    assert claimer.is_alive()
+
+    # The queue was renamed while the append held it; the line must still be read
+    append.write("late\n")
+    append.close()
+    claimer.join(timeout=5)
+
+    assert claimed == [["late\n"]]
+
+
+def test_concurrent_writers_lose_no_events(home):
+    # Half the writers get no lock wait, so contention exercises deferral too
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]); import stats; "
+        "stats.record_tool_usage('native:Read', lock_timeout_s=float(sys.argv[2]))"
+    )
+    env = dict(os.environ, HOME=str(home))
+    writers = [
+        subprocess.Popen([sys.executable, "-c", script, str(SCRIPTS), "0" if i % 2 else "5"], env=env, cwd=str(home))
+        for i in range(20)
+    ]
+    for writer in writers:
+        assert writer.wait(timeout=30) == 0
+
+    assert load_stats(include_deferred=True)["totals"]["tools"] == {"native:Read": 20}
+    assert leftover_files() == []
@@ -0,0 +1,88 @@
+"""
+Import-time regression tests for the track-tool.py hook.
+Runs the hook under `python -X importtime` and checks what it loads.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+HOOK = Path(__file__).parent.parent / "hooks" / "handlers" / "track-tool.py"
+
+# Cumulative import time of the plugin's own modules (config, stats,
+# sampling, metrics) on an enabled call. Measured at ~2ms; the budget
+# leaves headroom for slow CI machines.
+IMPORT_BUDGET_MS = 15.0
+
+PLUGIN_MODULES = {"config", "stats", "sampling", "metrics"}
+
+# Never needed on the hook path
+ALWAYS_FORBIDDEN = {"pathlib", "typing", "datetime", "random"}
+
+# A disabled category exits before anything stats-related is imported
+DISABLED_FORBIDDEN = ALWAYS_FORBIDDEN | {"stats", "sampling", "metrics"}
+
+
+def run_hook(tmp_path: Path, tool_name: str, enabled_categories: list) -> dict:
+    """Run the hook under -X importtime; return {module: cumulative_us}."""
+    config_dir = tmp_path / ".claude"
+    config_dir.mkdir(exist_ok=True)
+    categories = "\n".join(f"  - {cat}" for cat in enabled_categories)
+    (config_dir / "claude-tool-tracker.local.md").write_text(
+        f"---\nstats_location: local\nenabled_categories:\n{categories}\n---\n"
+    )
+
+    # Let the warm-up run cache bytecode (outside the repo) even when the
+    # environment disables writing it, so compilation isn't measured
+    env = dict(os.environ, HOME=str(tmp_path), PYTHONPYCACHEPREFIX=str(tmp_path / "pycache"))
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", str(HOOK)],
+        input=json.dumps({"tool_name": tool_name, "tool_input": {}}),
+        capture_output=True, text=True, cwd=str(tmp_path), env=env, timeout=30,
+    )
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout)["continue"] is True
+
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def best_of(tmp_path: Path, tool_name: str, enabled_categories: list, runs: int = 3) -> dict:
+    """Run the hook several times and keep the fastest time per module."""
+    best = {}
+    for _ in range(runs):
+        for name, cumulative in run_hook(tmp_path, tool_name, enabled_categories).items():
+            best[name] = min(best.get(name, cumulative), cumulative)
+    return best
+
+
+def test_disabled_category_skips_stats_imports(tmp_path):
+    modules = run_hook(tmp_path, "Read", ["agent"])
+
+    assert "config" in modules
+    assert not DISABLED_FORBIDDEN & modules.keys()
+
+
+def test_enabled_category_avoids_heavy_imports(tmp_path):
+    modules = run_hook(tmp_path, "Read", ["native"])
+
+    assert PLUGIN_MODULES <= modules.keys()
+    assert not ALWAYS_FORBIDDEN & modules.keys()
+
+
+def test_plugin_import_time_within_budget(tmp_path):
+    # Warm up so bytecode compilation isn't measured
+    run_hook(tmp_path, "Read", ["native"])
+    modules = best_of(tmp_path, "Read", ["native"])
+
+    total_ms = sum(modules[name] for name in PLUGIN_MODULES) / 1000
+    assert total_ms <= IMPORT_BUDGET_MS, f"plugin imports took {total_ms:.1f}ms"
@@ -0,0 +1,88 @@
+"""
+Tests for the static HTML report.
+"""
+
+import json
+import re
+
+from report import build_report
+
+
+def session(tools: dict, variance: dict = None) -> dict:
+    """Build a stored session from {tool: count} (all native tools)."""
+    entry = {
+        "start": None,
+        "end": None,
+        "tools": dict(tools),
+        "categories": {"native": sum(tools.values()), "mcp": 0, "agent": 0, "skill": 0, "command": 0},
+    }
+    if variance:
+        entry["variance"] = {"tools": dict(variance), "categories": {"native": sum(variance.values())}}
+    return entry
+
+
+def make_stats(sessions: dict) -> dict:
+    totals = {"tools": {}, "categories": {"native": 0, "mcp": 0, "agent": 0, "skill": 0, "command": 0}}
+    for day in sessions.values():
+        for name, count in day["tools"].items():
+            totals["tools"][name] = totals["tools"].get(name, 0) + count
+        totals["categories"]["native"] += day["categories"]["native"]
+    return {"sessions": sessions, "totals": totals}
+
+
+def chunks(html: str) -> dict:
+    """Parse the embedded per-month data blocks by chunk id."""
+    blocks = re.findall(r'<script type="application/json" id="chunk-([^"]+)">(.*?)</script>', html, re.DOTALL)
+    return {month: json.loads(payload) for month, payload in blocks}
+
+
+def test_trend_covers_days_without_activity():
+    html = build_report(make_stats({
+        "2026-01-30": session({"Read": 4}),
+        "2026-02-02": session({"Read": 2}),
+    }))
+
+    trend = re.search(r"<svg.*?</svg>", html).group(0)
+    # Four days on the axis, bars only for the two with activity
+    assert 'viewBox="0 0 4 100"' in trend
+    assert re.findall(r'<rect x="(\d+)"', trend) == ["0", "3"]
+    assert "2026-01-30 – 2026-02-02" in html
+
+
+def test_sessions_are_chunked_by_month():
+    html = build_report(make_stats({
+        "2026-01-30": session({"Read": 4}),
+        "2026-01-31": session({"Edit": 1}),
+        "2026-02-02": session({"Read": 2}),
+    }))
+
+    data = chunks(html)
+    assert sorted(data) == ["2026-01", "2026-02"]
+    assert sorted(data["2026-01"]) == ["2026-01-30", "2026-01-31"]
+    assert data["2026-02"] == {"2026-02-02": [["Read", 2]]}
+    assert 'data-chunk="2026-01"' in html
+
+
+def test_script_end_in_tool_name_is_escaped():
+    name = "mcp:evil:</script><script>alert(1)"
+    html = build_report(make_stats({"2026-01-30": session({name: 1})}))
+
+    assert "</script><script>alert(1)" not in html
+    assert r"<\/script>" in html
+    assert chunks(html)["2026-01"]["2026-01-30"] == [[name, 1]]
+
+
+def test_margins_only_for_sampled_tools():
+    html = build_report(make_stats({
+        "2026-01-30": session({"Read": 10, "Edit": 1}, variance={"Read": 90}),
+    }))
+
+    # 1.96 * sqrt(90) ~ 19 for the sampled tool; exact counts stay pairs
+    assert chunks(html)["2026-01"]["2026-01-30"] == [["Read", 10, 19], ["Edit", 1]]
+
+
+def test_empty_stats_render_placeholders():
+    html = build_report(make_stats({}))
+
+    assert "No sessions recorded yet." in html
+    assert "__" not in re.sub(r"<script>.*?</script>", "", html, flags=re.DOTALL)
@@ -0,0 +1,131 @@
+"""
+Tests for adaptive sampling and the weighted estimates it produces.
+"""
+
+import pytest
+
+import sampling
+import stats
+from sampling import MIN_SAMPLING_RATE, adjust_rate, record_sampled_tool_usage, save_sampling_state
+from stats import _add_weighted, format_estimate, format_stats_output, load_stats, record_tool_usage
+
+
+def empty_bucket() -> dict:
+    return {"tools": {}, "categories": {}}
+
+
+def test_add_weighted_unsampled_call_adds_no_variance():
+    bucket = empty_bucket()
+    _add_weighted(bucket, "Read", "native", 1)
+
+    assert bucket["tools"] == {"Read": 1}
+    assert bucket["categories"] == {"native": 1}
+    assert "variance" not in bucket
+
+
+def test_add_weighted_sampled_call_adds_weight_and_variance():
+    bucket = empty_bucket()
+    _add_weighted(bucket, "Read", "native", 4)
+    _add_weighted(bucket, "Read", "native", 2)
+
+    assert bucket["tools"] == {"Read": 6}
+    assert bucket["categories"] == {"native": 6}
+    # w * (w - 1) per call: 4 * 3 + 2 * 1
+    assert bucket["variance"] == {"tools": {"Read": 14}, "categories": {"native": 14}}
+
+
+def test_rare_categories_are_always_recorded_with_weight_one(home):
+    save_sampling_state({"rate": MIN_SAMPLING_RATE, "fixed_ms": 1.0, "cost_ms": 100.0})
+
+    for _ in range(5):
+        assert record_sampled_tool_usage("agent:reviewer", "agent", {}) == (1.0, False)
+
+    totals = load_stats()["totals"]
+    assert totals["tools"]["agent:reviewer"] == 5
+    assert "variance" not in totals
+
+
+def test_sampled_category_is_weighted_by_inverse_rate(home, monkeypatch):
+    save_sampling_state({"rate": 0.25, "fixed_ms": 0.0, "cost_ms": 0.0})
+    monkeypatch.setattr(sampling, "_random", lambda: 0.1)
+
+    weight, deferred = record_sampled_tool_usage("native:Read", "native", {})
+
+    assert (weight, deferred) == (4.0, False)
+    totals = load_stats()["totals"]
+    assert totals["tools"]["native:Read"] == 4.0
+    assert totals["variance"]["tools"]["native:Read"] == 12.0
+
+
+def test_skipped_call_is_not_recorded(home, monkeypatch):
+    save_sampling_state({"rate": 0.25, "fixed_ms": 0.0, "cost_ms": 0.0})
+    monkeypatch.setattr(sampling, "_random", lambda: 0.9)
+
+    assert record_sampled_tool_usage("native:Read", "native", {}) == (None, False)
+    assert load_stats()["totals"]["tools"] == {}
+
+
+def test_contended_lock_defers_without_touching_cost_averages(home, monkeypatch):
+    state = {"rate": 0.5, "fixed_ms": 0.5, "cost_ms": 1.5}
+    save_sampling_state(state)
+    monkeypatch.setattr(sampling, "_random", lambda: 0.1)
+
+    acquired, lock = stats.lock_stats()
+    assert acquired
+    try:
+        assert record_sampled_tool_usage("native:Read", "native", {}, lock_timeout_s=0) == (2.0, True)
+    finally:
+        lock.close()
+
+    assert sampling.load_sampling_state() == state
+    assert stats.read_deferred_usage()[0]["weight"] == 2.0
+
+
+@pytest.mark.parametrize("fixed_ms, record_ms, expected", [
+    (0.1, 1.0, 1.0),                   # Well within budget: record everything
+    (0.1, 0.0, 1.0),                   # No cost measured yet
+    (1.0, 1000.0, MIN_SAMPLING_RATE),  # Far over budget: floor
+    (10.0, 1.0, MIN_SAMPLING_RATE),    # Fixed cost alone exceeds budget
+])
+def test_adjust_rate_clamps(fixed_ms, record_ms, expected):
+    state = adjust_rate({"rate": 1.0, "fixed_ms": 0.0, "cost_ms": 0.0}, fixed_ms, record_ms, budget_ms=5.0)
+
+    assert state["rate"] == expected
+
+
+def test_adjust_rate_meets_budget_between_bounds():
+    state = adjust_rate({"rate": 1.0, "fixed_ms": 0.0, "cost_ms": 0.0}, 1.0, 8.0, budget_ms=5.0)
+
+    # fixed + rate * cost == budget
+    assert state["rate"] == pytest.approx(0.5)
+
+
+def test_format_estimate_shows_margin_only_when_sampled():
+    assert format_estimate(10) == "10"
+    assert format_estimate(10.4, 0) == "10"
+    # 1.96 * sqrt(25) = 9.8
+    assert format_estimate(100, 25) == "100 ±10"
+
+
+def test_format_stats_output_without_sampling_has_no_margins(home):
+    for _ in range(3):
+        record_tool_usage("native:Read")
+
+    output = format_stats_output(session_only=False)
+
+    assert "±" not in output
+    assert "Total: 3 tool calls" in output
+
+
+def test_format_stats_output_with_sampling_shows_margins(home):
+    record_tool_usage("native:Read", 10)
+    record_tool_usage("agent:reviewer")
+
+    output = format_stats_output(session_only=False)
+
+    # One call at w = 10: variance 90, margin 1.96 * sqrt(90) ~ 19
+    assert "(10 ±19)" in output
+    # The unsampled agent keeps an exact count
+    reviewer = next(line for line in output.splitlines() if "reviewer" in line)
+    assert "(1)" in reviewer
+    assert "Total: ~11 ±19 tool calls (sampled, 95% CI)" in output